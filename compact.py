@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+from dotenv import load_dotenv
+from rate_limit import TokenBucket, rate_limited_client
+from pipelines import PIPELINES, load_pipeline
+
+def iter_pages(client, database_id, filter=None, sorts=None):
+    """
+    Stream every page of a database (optionally filtered and sorted), 100 at a time.
+    """
+    cursor = None
+    while True:
+        query = {"database_id": database_id, "page_size": 100}
+        if filter:
+            query["filter"] = filter
+        if sorts:
+            query["sorts"] = sorts
+        if cursor:
+            query["start_cursor"] = cursor
+        response = client.databases.query(**query)
+        yield from response['results']
+        if not response.get('has_more'):
+            return
+        cursor = response['next_cursor']
+
+def survivor_rank(page):
+    # Keep the page still flagged as PR if there is one, otherwise the oldest page
+    is_pr = (page['properties'].get('PR') or {}).get('checkbox') is True
+    return (not is_pr, page.get('created_time', ''))
+
+def find_duplicates(pages, natural_key):
+    """
+    Group pages by natural key. Returns ([(key, survivor, [duplicates])] for keys with more
+    than one page, [pages whose key has an empty part]); the latter cannot be matched safely
+    and are never treated as duplicates.
+    """
+    groups = {}
+    unkeyed = []
+    for page in pages:
+        key = natural_key(page['properties'])
+        if not all(key):
+            unkeyed.append(page)
+            continue
+        groups.setdefault(key, []).append(page)
+
+    duplicates = []
+    for key, group in groups.items():
+        if len(group) > 1:
+            group.sort(key=survivor_rank)
+            duplicates.append((key, group[0], group[1:]))
+    return duplicates, unkeyed
+
+def compact_database(client, database_id, natural_key, apply=False):
+    """
+    Find duplicate pages in a database and, when apply is set, archive all but the survivor of each
+    group: the page flagged as PR if there is one, otherwise the oldest (see survivor_rank).
+    """
+    duplicates, unkeyed = find_duplicates(iter_pages(client, database_id), natural_key)
+    report = {"groups": [], "skipped": [page['id'] for page in unkeyed]}
+    for key, survivor, removed in duplicates:
+        archived = []
+        for page in removed:
+            if apply:
+                try:
+                    client.pages.update(page_id=page['id'], archived=True)
+                except Exception as e:
+                    print(f"Error archiving duplicate {page['id']}: {e}")
+                    continue
+            archived.append(page['id'])
+        report["groups"].append({"key": list(key), "survivor": survivor['id'], "removed": archived})
+    return report
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Find and archive duplicate pages in the Notion databases.")
+    parser.add_argument("--apply", action="store_true", help="archive the duplicates, keeping the PR page or else the oldest (default: only report them)")
+    parser.add_argument("--only", nargs="+", choices=list(PIPELINES), help="restrict to these databases")
+    parser.add_argument("--report", metavar="PATH", help="also write the report as JSON to PATH")
+    args = parser.parse_args()
+
+    client = rate_limited_client(os.getenv("NOTION_TOKEN"), TokenBucket())
+
+    reports = {}
+    for name, (_, env_var) in PIPELINES.items():
+        database_id = os.getenv(env_var)
+        if not database_id or (args.only and name not in args.only):
+            continue
+        report = compact_database(client, database_id, load_pipeline(name).natural_key, args.apply)
+        removed = sum(len(group["removed"]) for group in report["groups"])
+        action = "Archived" if args.apply else "Would archive"
+        print(f"{name}: {action} {removed} duplicate pages in {len(report['groups'])} groups")
+        for group in report["groups"]:
+            print(f"  {' | '.join(group['key'])}: keep {group['survivor']}, remove {', '.join(group['removed'])}")
+        if report["skipped"]:
+            print(f"  Skipped {len(report['skipped'])} pages with an empty date or name: {', '.join(report['skipped'])}")
+        reports[name] = report
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,24 @@ from datetime import date, timedelta
 from garminconnect import Garmin
 from notion_client import Client
 from dotenv import load_dotenv
+from notion_schema import DEFAULT_SCHEMA_CACHE, compile_extractors, ensure_schema
+from profiling import span, profiled, add_profile_arguments
+from journal import DEFAULT_JOURNAL
+from sync_plan import new_plan, plan_create, plan_update, run_plan, add_plan_argument
+import argparse
 import os
 
+# Properties the daily steps database must have, with their Notion types
+REQUIRED_PROPERTIES = {
+    "Activity Type": "title",
+    "Date": "date",
+    "Total Steps": "number",
+    "Step Goal": "number",
+    "Total Distance (km)": "number",
+}
+
+STEPS_FIELDS = compile_extractors(REQUIRED_PROPERTIES)
+
 def get_all_daily_steps(garmin):
     """
     Get last x days of daily step count data from Garmin Connect.
@@ -32,23 +48,37 @@ def daily_steps_exist(client, database_id, activity_date):
     results = query['results']
     return results[0] if results else None
 
+def existing_page(client, database_id, page):
+    """
+    Look up the entry a planned create would make.
+    """
+    return daily_steps_exist(client, database_id, STEPS_FIELDS['Date'](page['properties']))
+
+def natural_key(properties):
+    """
+    Identity of a daily steps page for duplicate detection: one entry per day.
+    """
+    return ((STEPS_FIELDS['Date'](properties) or "")[:10],)
+
 def steps_need_update(existing_steps, new_steps):
     """
     Compare existing steps data with imported data to determine if an update is needed.
     """
     existing_props = existing_steps['properties']
+    field = {name: extract(existing_props) for name, extract in STEPS_FIELDS.items()}
     activity_type = "Walking"
+    total_distance = new_steps.get('totalDistance') or 0
     
     return (
-        existing_props['Total Steps']['number'] != new_steps.get('totalSteps') or
-        existing_props['Step Goal']['number'] != new_steps.get('stepGoal') or
-        existing_props['Total Distance (km)']['number'] != new_steps.get('totalDistance') or
-        existing_props['Activity Type']['title'] != activity_type
+        field['Total Steps'] != new_steps.get('totalSteps') or
+        field['Step Goal'] != new_steps.get('stepGoal') or
+        field['Total Distance (km)'] != round(total_distance / 1000, 2) or
+        field['Activity Type'] != activity_type
     )
 
-def update_daily_steps(client, existing_steps, new_steps):
+def daily_steps_update(existing_steps, new_steps):
     """
-    Update an existing daily steps entry in the Notion database with new data.
+    Build the pages.update payload for an existing daily steps entry.
     """
     total_distance = new_steps.get('totalDistance')
     if total_distance is None:
@@ -65,11 +95,11 @@ def update_daily_steps(client, existing_steps, new_steps):
         "properties": properties,
     }
         
-    client.pages.update(**update)
+    return update
 
-def create_daily_steps(client, database_id, steps):
+def daily_steps_page(database_id, steps):
     """
-    Create a new daily steps entry in the Notion database.
+    Build the pages.create payload for a new daily steps entry.
     """
     total_distance = steps.get('totalDistance')
     if total_distance is None:
@@ -87,31 +117,72 @@ def create_daily_steps(client, database_id, steps):
         "properties": properties,
     }
     
-    client.pages.create(**page)
+    return page
+
+def probe(garmin):
+    """
+    Cheap change check for the scheduler: the last synced date and its step count.
+    """
+    daily_steps = get_all_daily_steps(garmin)
+    if not daily_steps:
+        return None
+    last = daily_steps[-1]
+    return [last.get('calendarDate'), last.get('totalSteps')]
+
+def build_plan(garmin, client, database_id, schema_cache=DEFAULT_SCHEMA_CACHE):
+    """
+    Work out which daily steps entries need to be created or updated, without writing.
+    """
+    ensure_schema(client, database_id, REQUIRED_PROPERTIES, cache_path=schema_cache)
+    plan = new_plan("daily_steps", database_id)
+    with span("garmin.fetch"):
+        daily_steps = get_all_daily_steps(garmin)
+    for steps in daily_steps:
+        steps_date = steps.get('calendarDate')
+        with span("notion.lookup"):
+            existing_steps = daily_steps_exist(client, database_id, steps_date)
+        if existing_steps:
+            with span("diff"):
+                needs_update = steps_need_update(existing_steps, steps)
+            if needs_update:
+                with span("build"):
+                    plan_update(plan, existing_steps, daily_steps_update(existing_steps, steps), steps_date)
+        else:
+            with span("build"):
+                plan_create(plan, daily_steps_page(database_id, steps), steps_date)
+    return plan
+
+def sync(garmin, client, database_id, plan_path=None, journal_path=DEFAULT_JOURNAL, schema_cache=DEFAULT_SCHEMA_CACHE):
+    """
+    Sync daily steps to Notion, or only write the plan to plan_path when given.
+    """
+    return run_plan(
+        client, database_id, lambda: build_plan(garmin, client, database_id, schema_cache), plan_path, journal_path,
+        find_existing=lambda page: existing_page(client, database_id, page)
+    )
 
 def main():
     load_dotenv()
 
+    parser = argparse.ArgumentParser(description="Sync Garmin daily steps to Notion.")
+    add_plan_argument(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
     # Initialize Garmin and Notion clients using environment variables
     garmin_email = os.getenv("GARMIN_EMAIL")
     garmin_password = os.getenv("GARMIN_PASSWORD")
     notion_token = os.getenv("NOTION_TOKEN")
     database_id = os.getenv("NOTION_STEPS_DB_ID")
 
-    # Initialize Garmin client and login
-    garmin = Garmin(garmin_email, garmin_password)
-    garmin.login()
-    client = Client(auth=notion_token)
+    with profiled(args.profile, args.profile_dir, "daily_steps"):
+        # Initialize Garmin client and login
+        with span("garmin.login"):
+            garmin = Garmin(garmin_email, garmin_password)
+            garmin.login()
+        client = Client(auth=notion_token)
 
-    daily_steps = get_all_daily_steps(garmin)
-    for steps in daily_steps:
-        steps_date = steps.get('calendarDate')
-        existing_steps = daily_steps_exist(client, database_id, steps_date)
-        if existing_steps:
-            if steps_need_update(existing_steps, steps):
-                update_daily_steps(client, existing_steps, steps)
-        else:
-            create_daily_steps(client, database_id, steps)
+        sync(garmin, client, database_id, args.plan)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,265 @@
+import argparse
+import csv
+import json
+import os
+import uuid
+from datetime import datetime
+from itertools import islice
+from dotenv import load_dotenv
+from compact import iter_pages
+from notion_schema import VALUE_READERS
+from pipelines import PIPELINES, load_pipeline
+from rate_limit import TokenBucket, rate_limited_client
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+DEFAULT_OUTPUT_DIR = "export"
+ROW_GROUP_SIZE = 1000
+STATE_FILE = "export-state.json"
+FORMATS = ["csv", "parquet"]
+
+# The property each dataset is appended by
+DATE_PROPERTIES = {
+    "activities": "Date",
+    "personal_records": "Date",
+    "daily_steps": "Date",
+    "sleep": "Long Date",
+}
+
+ARROW_TYPES = {"number": "float64", "checkbox": "bool"}
+
+def columns(required_properties):
+    """
+    Return [(column, type)] for a pipeline: the Notion page id, then each property;
+    date properties get a second column for their end.
+    """
+    result = [("Page ID", "rich_text")]
+    for name, prop_type in required_properties.items():
+        result.append((name, prop_type))
+        if prop_type == "date":
+            result.append((f"{name} End", prop_type))
+    return result
+
+def flatten(page, required_properties):
+    properties = page['properties']
+    row = {"Page ID": page['id']}
+    for name, prop_type in required_properties.items():
+        value = (properties.get(name) or {}).get(prop_type)
+        if prop_type == "date":
+            row[name] = (value or {}).get('start')
+            row[f"{name} End"] = (value or {}).get('end')
+        elif prop_type == "number" and value is not None:
+            row[name] = float(value)
+        else:
+            row[name] = VALUE_READERS[prop_type](value) if value is not None else None
+    return row
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+def is_new(row, date_property, cursor):
+    """
+    Whether a row comes after a format's cursor {"date", "ids"}: a later date, or the
+    cursor's date but not written yet (rows sharing a date can straddle a checkpoint).
+    """
+    if not cursor:
+        return True
+    row_date = row[date_property]
+    if row_date is None:
+        return False
+    return row_date > cursor["date"] or (row_date == cursor["date"] and row["Page ID"] not in cursor["ids"])
+
+def advance(cursor, rows, date_property):
+    """
+    Return a new cursor past rows, which arrive sorted by date. The cursor passed in is
+    never changed, since it may still be the one saved for another checkpoint.
+    """
+    if cursor:
+        cursor = {"date": cursor["date"], "ids": list(cursor["ids"])}
+    for row in rows:
+        row_date = row[date_property]
+        if row_date is None:
+            continue
+        if not cursor or row_date > cursor["date"]:
+            cursor = {"date": row_date, "ids": []}
+        if row_date == cursor["date"]:
+            cursor["ids"].append(row["Page ID"])
+    return cursor
+
+class CsvSink:
+    def __init__(self, path, column_names, overwrite=False):
+        append = os.path.exists(path) and not overwrite
+        self.file = open(path, "a" if append else "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=column_names)
+        if not append:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        # Rows must be on disk before the cursor covering them is saved
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+class ParquetSink:
+    """
+    Writes one part file per run under a temporary name and renames it into place on
+    close, so an interrupted run leaves no partial part behind.
+    """
+
+    def __init__(self, path, dataset_columns, overwrite=False, row_group_size=ROW_GROUP_SIZE):
+        self.path = path
+        self.row_group_size = row_group_size
+        self.schema = pa.schema([(name, ARROW_TYPES.get(prop_type, "string")) for name, prop_type in dataset_columns])
+        self.overwrite = overwrite
+        self.writer = None
+
+    def write(self, rows):
+        # Opened lazily so a run with nothing new leaves no empty file behind
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.writer = pq.ParquetWriter(f"{self.path}.tmp", self.schema)
+        self.writer.write_table(pa.Table.from_pylist(rows, schema=self.schema), row_group_size=self.row_group_size)
+
+    def close(self, complete=True):
+        if self.writer is None:
+            return
+        self.writer.close()
+        if not complete:
+            os.remove(f"{self.path}.tmp")
+            return
+        dataset_dir = os.path.dirname(self.path)
+        if self.overwrite:
+            for part in os.listdir(dataset_dir):
+                if part.startswith("part-") and part.endswith(".parquet"):
+                    os.remove(os.path.join(dataset_dir, part))
+        # link() refuses to replace an existing part, unlike rename
+        os.link(f"{self.path}.tmp", self.path)
+        os.remove(f"{self.path}.tmp")
+
+def load_export_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_export_state(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+def checkpoint(path, state, output_format, name, cursor):
+    """
+    Save one format's cursor for a dataset, leaving every other cursor as it was saved.
+    """
+    state.setdefault(output_format, {})[name] = cursor
+    saved = load_export_state(path)
+    saved.setdefault(output_format, {})[name] = cursor
+    save_export_state(path, saved)
+
+def export_dataset(pages, name, required_properties, output_dir, formats, state, state_path, row_group_size=ROW_GROUP_SIZE):
+    """
+    Stream one dataset's pages, sorted by date, to CSV and/or Parquet in fixed-size groups.
+    Each format keeps its own cursor in state[format][name]: without one the earlier export
+    is replaced, with one only rows past it are appended. The CSV cursor is saved after
+    every chunk, the Parquet cursor only once its part file is complete.
+    Returns {format: rows written}.
+    """
+    dataset_columns = columns(required_properties)
+    date_property = DATE_PROPERTIES[name]
+    cursors = {output_format: state.get(output_format, {}).get(name) for output_format in formats}
+    sinks = {}
+    if "csv" in formats:
+        path = os.path.join(output_dir, f"{name}.csv")
+        sinks["csv"] = CsvSink(path, [column for column, _ in dataset_columns], not cursors["csv"])
+    if "parquet" in formats:
+        # Unique per run, so two exports in the same second never share a part
+        part = f"part-{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+        path = os.path.join(output_dir, name, part)
+        sinks["parquet"] = ParquetSink(path, dataset_columns, not cursors["parquet"], row_group_size)
+
+    counts = {output_format: 0 for output_format in sinks}
+    complete = False
+    try:
+        rows = (flatten(page, required_properties) for page in pages)
+        for chunk in chunks(rows, row_group_size):
+            for output_format, sink in sinks.items():
+                new = [row for row in chunk if is_new(row, date_property, cursors[output_format])]
+                if not new:
+                    continue
+                sink.write(new)
+                counts[output_format] += len(new)
+                cursors[output_format] = advance(cursors[output_format], new, date_property)
+            if "csv" in sinks:
+                checkpoint(state_path, state, "csv", name, cursors["csv"])
+        complete = True
+    finally:
+        if "csv" in sinks:
+            sinks["csv"].close()
+        if "parquet" in sinks:
+            sinks["parquet"].close(complete)
+
+    if "parquet" in sinks:
+        checkpoint(state_path, state, "parquet", name, cursors["parquet"])
+    return counts
+
+def date_filter(name, state, formats):
+    """
+    Notion filter that skips pages dated before the oldest cursor of the formats being written.
+    """
+    cursors = [state.get(output_format, {}).get(name) for output_format in formats]
+    if not all(cursors):
+        return None
+    oldest = min(cursor["date"] for cursor in cursors)
+    return {"property": DATE_PROPERTIES[name], "date": {"on_or_after": oldest[:10]}}
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Export the synced Notion databases to CSV and Parquet for offline analysis.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR, help="output directory")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=FORMATS, dest="formats")
+    parser.add_argument("--only", nargs="+", choices=list(PIPELINES), help="restrict the export to these datasets")
+    parser.add_argument("--full", action="store_true", help="export the whole history instead of only rows newer than the last export")
+    args = parser.parse_args()
+
+    if "parquet" in args.formats and pa is None:
+        parser.error("Parquet export needs pyarrow: pip install pyarrow (or use --format csv)")
+
+    os.makedirs(args.output, exist_ok=True)
+    state_path = os.path.join(args.output, STATE_FILE)
+    state = load_export_state(state_path)
+    if args.full:
+        for output_format in args.formats:
+            state.pop(output_format, None)
+
+    client = rate_limited_client(os.getenv("NOTION_TOKEN"), TokenBucket())
+    for name, (_, env_var) in PIPELINES.items():
+        database_id = os.getenv(env_var)
+        if not database_id or (args.only and name not in args.only):
+            continue
+        pages = iter_pages(
+            client, database_id,
+            filter=date_filter(name, state, args.formats),
+            sorts=[{"property": DATE_PROPERTIES[name], "direction": "ascending"}]
+        )
+        counts = export_dataset(
+            pages, name, load_pipeline(name).REQUIRED_PROPERTIES,
+            args.output, args.formats, state, state_path
+        )
+        print(f"{name}: exported " + ", ".join(f"{count} new {output_format} rows" for output_format, count in counts.items()))
+
+if __name__ == '__main__':
+    main()
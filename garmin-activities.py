@@ -2,6 +2,11 @@ from datetime import datetime, timezone, timedelta
 from garminconnect import Garmin
 from notion_client import Client
 from dotenv import load_dotenv
+from notion_schema import DEFAULT_SCHEMA_CACHE, compile_extractors, ensure_schema, utc_date
+from profiling import span, profiled, add_profile_arguments
+from journal import DEFAULT_JOURNAL
+from sync_plan import new_plan, plan_create, plan_update, run_plan, add_plan_argument
+import argparse
 import pytz
 import os
 
@@ -30,6 +35,29 @@ ACTIVITY_ICONS = {
     # Add more mappings as needed
 }
 
+# Properties the activities database must have, with their Notion types
+REQUIRED_PROPERTIES = {
+    "Date": "date",
+    "Activity Type": "select",
+    "Subactivity Type": "select",
+    "Activity Name": "title",
+    "Distance (km)": "number",
+    "Duration (min)": "number",
+    "Calories": "number",
+    "Avg Pace": "rich_text",
+    "Avg Power": "number",
+    "Max Power": "number",
+    "Training Effect": "select",
+    "Aerobic": "number",
+    "Aerobic Effect": "select",
+    "Anaerobic": "number",
+    "Anaerobic Effect": "select",
+    "PR": "checkbox",
+    "Fav": "checkbox",
+}
+
+ACTIVITY_FIELDS = compile_extractors(REQUIRED_PROPERTIES)
+
 def get_all_activities(garmin, limit=1000):
     return garmin.get_activities(0, limit)
 
@@ -133,9 +161,28 @@ def activity_exists(client, database_id, activity_date, activity_type, activity_
     results = query['results']
     return results[0] if results else None
 
+def existing_page(client, database_id, page):
+
+    # Look up the page a planned create would make, using the same match as activity_exists
+    properties = page['properties']
+    activity_date = (ACTIVITY_FIELDS['Date'](properties) or "").split('/')[0]
+    return activity_exists(
+        client, database_id, activity_date,
+        ACTIVITY_FIELDS['Activity Type'](properties), ACTIVITY_FIELDS['Activity Name'](properties)
+    )
+
+def natural_key(properties):
+
+    # Identity of an activity page for duplicate detection, normalized the way activity_exists matches
+    activity_date = utc_date((ACTIVITY_FIELDS['Date'](properties) or "").split('/')[0])
+    activity_name = format_entertainment(ACTIVITY_FIELDS['Activity Name'](properties) or "").strip().lower()
+    activity_type = (ACTIVITY_FIELDS['Activity Type'](properties) or "").strip().lower()
+    return (activity_date, activity_type, activity_name)
+
 
 def activity_needs_update(existing_activity, new_activity):
     existing_props = existing_activity['properties']
+    field = {name: extract(existing_props) for name, extract in ACTIVITY_FIELDS.items()}
 
     activity_name = new_activity.get('activityName', '').lower()
     activity_type, activity_subtype = format_activity_type(
@@ -143,30 +190,23 @@ def activity_needs_update(existing_activity, new_activity):
         activity_name
     )
 
-    # Check if 'Subactivity Type' property exists
-    has_subactivity = (
-        'Subactivity Type' in existing_props and 
-        existing_props['Subactivity Type'] is not None and
-        existing_props['Subactivity Type'].get('select') is not None
-    )
-
+    # Properties missing from the page read as None, so they always count as a change
     return (
-        existing_props['Distance (km)']['number'] != round(new_activity.get('distance', 0) / 1000, 2) or
-        existing_props['Duration (min)']['number'] != round(new_activity.get('duration', 0) / 60, 2) or
-        existing_props['Calories']['number'] != round(new_activity.get('calories', 0)) or
-        existing_props['Avg Pace']['rich_text'][0]['text']['content'] != format_pace(new_activity.get('averageSpeed', 0)) or
-        existing_props['Avg Power']['number'] != round(new_activity.get('avgPower', 0), 1) or
-        existing_props['Max Power']['number'] != round(new_activity.get('maxPower', 0), 1) or
-        existing_props['Training Effect']['select']['name'] != format_training_effect(new_activity.get('trainingEffectLabel', 'Unknown')) or
-        existing_props['Aerobic']['number'] != round(new_activity.get('aerobicTrainingEffect', 0), 1) or
-        existing_props['Aerobic Effect']['select']['name'] != format_training_message(new_activity.get('aerobicTrainingEffectMessage', 'Unknown')) or
-        existing_props['Anaerobic']['number'] != round(new_activity.get('anaerobicTrainingEffect', 0), 1) or
-        existing_props['Anaerobic Effect']['select']['name'] != format_training_message(new_activity.get('anaerobicTrainingEffectMessage', 'Unknown')) or
-        existing_props['PR']['checkbox'] != new_activity.get('pr', False) or
-        existing_props['Fav']['checkbox'] != new_activity.get('favorite', False) or
-        existing_props['Activity Type']['select']['name'] != activity_type or
-        (has_subactivity and existing_props['Subactivity Type']['select']['name'] != activity_subtype) or
-        (not has_subactivity)  # If the property doesn't exist, we need an update
+        field['Distance (km)'] != round(new_activity.get('distance', 0) / 1000, 2) or
+        field['Duration (min)'] != round(new_activity.get('duration', 0) / 60, 2) or
+        field['Calories'] != round(new_activity.get('calories', 0)) or
+        field['Avg Pace'] != format_pace(new_activity.get('averageSpeed', 0)) or
+        field['Avg Power'] != round(new_activity.get('avgPower', 0), 1) or
+        field['Max Power'] != round(new_activity.get('maxPower', 0), 1) or
+        field['Training Effect'] != format_training_effect(new_activity.get('trainingEffectLabel', 'Unknown')) or
+        field['Aerobic'] != round(new_activity.get('aerobicTrainingEffect', 0), 1) or
+        field['Aerobic Effect'] != format_training_message(new_activity.get('aerobicTrainingEffectMessage', 'Unknown')) or
+        field['Anaerobic'] != round(new_activity.get('anaerobicTrainingEffect', 0), 1) or
+        field['Anaerobic Effect'] != format_training_message(new_activity.get('anaerobicTrainingEffectMessage', 'Unknown')) or
+        field['PR'] != new_activity.get('pr', False) or
+        field['Fav'] != new_activity.get('favorite', False) or
+        field['Activity Type'] != activity_type or
+        field['Subactivity Type'] != activity_subtype
     )
 
 def convert_to_local_time(gmt_time_str):
@@ -189,9 +229,9 @@ def get_activity_end_time(start_time_str, duration_seconds):
 
     return start_time, end_time
 
-def create_activity(client, database_id, activity):
+def activity_page(database_id, activity):
 
-    # Create a new activity in the Notion database
+    # Build the pages.create payload for a new activity
     activity_date = activity.get('startTimeGMT')
     activity_name = format_entertainment(activity.get('activityName', 'Unnamed Activity'))
     activity_type, activity_subtype = format_activity_type(
@@ -233,11 +273,11 @@ def create_activity(client, database_id, activity):
     if icon_url:
         page["icon"] = {"type": "external", "external": {"url": icon_url}}
 
-    client.pages.create(**page)
+    return page
 
-def update_activity(client, existing_activity, new_activity):
+def activity_update(existing_activity, new_activity):
 
-    # Update an existing activity in the Notion database with new data
+    # Build the pages.update payload for an existing activity
     activity_name = new_activity.get('activityName', 'Unnamed Activity')
     activity_type, activity_subtype = format_activity_type(
         new_activity.get('activityType', {}).get('typeKey', 'Unknown'),
@@ -273,24 +313,21 @@ def update_activity(client, existing_activity, new_activity):
     if icon_url:
         update["icon"] = {"type": "external", "external": {"url": icon_url}}
 
-    client.pages.update(**update)
+    return update
 
-def main():
-    load_dotenv()
+def probe(garmin):
 
-    # Initialize Garmin and Notion clients using environment variables
-    garmin_email = os.getenv("GARMIN_EMAIL")
-    garmin_password = os.getenv("GARMIN_PASSWORD")
-    notion_token = os.getenv("NOTION_TOKEN")
-    database_id = os.getenv("NOTION_DB_ID")
+    # Cheap change check for the scheduler: the id of the newest activity
+    newest = garmin.get_activities(0, 1)
+    return newest[0].get('activityId') if newest else None
 
-    # Initialize Garmin client and login
-    garmin = Garmin(garmin_email, garmin_password)
-    garmin.login()
-    client = Client(auth=notion_token)
+def build_plan(garmin, client, database_id, schema_cache=DEFAULT_SCHEMA_CACHE):
+    ensure_schema(client, database_id, REQUIRED_PROPERTIES, cache_path=schema_cache)
+    plan = new_plan("activities", database_id)
 
     # Get all activities
-    activities = get_all_activities(garmin)
+    with span("garmin.fetch"):
+        activities = get_all_activities(garmin)
 
     # Process all activities
     for activity in activities:
@@ -300,17 +337,52 @@ def main():
             activity.get('activityType', {}).get('typeKey', 'Unknown'),
             activity_name
         )
+        label = f"{activity_date} {activity_type} - {activity_name}"
 
         # Check if activity already exists in Notion
-        existing_activity = activity_exists(client, database_id, activity_date, activity_type, activity_name)
+        with span("notion.lookup"):
+            existing_activity = activity_exists(client, database_id, activity_date, activity_type, activity_name)
 
         if existing_activity:
-            if activity_needs_update(existing_activity, activity):
-                update_activity(client, existing_activity, activity)
-                # print(f"Updated: {activity_type} - {activity_name}")
+            with span("diff"):
+                needs_update = activity_needs_update(existing_activity, activity)
+            if needs_update:
+                with span("build"):
+                    plan_update(plan, existing_activity, activity_update(existing_activity, activity), label)
         else:
-            create_activity(client, database_id, activity)
-            # print(f"Created: {activity_type} - {activity_name}")
+            with span("build"):
+                plan_create(plan, activity_page(database_id, activity), label)
+
+    return plan
+
+def sync(garmin, client, database_id, plan_path=None, journal_path=DEFAULT_JOURNAL, schema_cache=DEFAULT_SCHEMA_CACHE):
+    return run_plan(
+        client, database_id, lambda: build_plan(garmin, client, database_id, schema_cache), plan_path, journal_path,
+        find_existing=lambda page: existing_page(client, database_id, page)
+    )
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Sync Garmin activities to Notion.")
+    add_plan_argument(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    # Initialize Garmin and Notion clients using environment variables
+    garmin_email = os.getenv("GARMIN_EMAIL")
+    garmin_password = os.getenv("GARMIN_PASSWORD")
+    notion_token = os.getenv("NOTION_TOKEN")
+    database_id = os.getenv("NOTION_DB_ID")
+
+    with profiled(args.profile, args.profile_dir, "activities"):
+        # Initialize Garmin client and login
+        with span("garmin.login"):
+            garmin = Garmin(garmin_email, garmin_password)
+            garmin.login()
+        client = Client(auth=notion_token)
+
+        sync(garmin, client, database_id, args.plan)
 
 if __name__ == '__main__':
     main()
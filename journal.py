@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import threading
+
+# Append-only log of Notion writes: each write is recorded as pending (with its payload)
+# before it is sent and as done (with its page id) once Notion accepts it. The next run
+# replays the writes left unconfirmed before it rebuilds its plan from Notion.
+DEFAULT_JOURNAL = ".sync-journal.jsonl"
+
+_lock = threading.Lock()
+
+def operation_id(database_id, kind, entry):
+    """
+    Deterministic id for a write, so the same write planned again maps to the same journal entry.
+    """
+    payload = entry["page"] if kind == "create" else entry["update"]
+    key = json.dumps([database_id, kind, payload], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def _append(path, record):
+    with _lock, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def _read(path):
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # A crash mid-write can leave a truncated last line
+                continue
+    return records
+
+def load_journal(path):
+    """
+    Return {operation id: state} with the database, kind, entry, latest status and page id of
+    every write, in the order the writes were first recorded.
+    """
+    operations = {}
+    for record in _read(path):
+        state = operations.setdefault(record["id"], {})
+        if record["status"] == "pending":
+            state.update(database_id=record["database_id"], kind=record["kind"], entry=record["entry"], status="pending")
+        else:
+            state["status"] = record["status"]
+            if record.get("page_id"):
+                state["page_id"] = record["page_id"]
+    return operations
+
+def record_pending(path, op_id, database_id, kind, entry):
+    _append(path, {"id": op_id, "status": "pending", "database_id": database_id, "kind": kind, "entry": entry})
+
+def record_done(path, op_id, page_id):
+    _append(path, {"id": op_id, "status": "done", "page_id": page_id})
+
+def record_failed(path, op_id, error):
+    _append(path, {"id": op_id, "status": "failed", "error": str(error)})
+
+def unfinished(operations, database_id):
+    """
+    {operation id: state} of the writes for database_id that were started but never confirmed.
+    """
+    return {
+        op_id: state for op_id, state in operations.items()
+        if state.get("database_id") == database_id and state.get("status") in ("pending", "failed")
+    }
+
+def truncate(path, database_id, keep=()):
+    """
+    Drop every entry for database_id except the writes in keep (those still unconfirmed).
+    """
+    with _lock:
+        records = _read(path)
+        databases = {
+            record["id"]: record["database_id"] for record in records if record["status"] == "pending"
+        }
+        kept = [
+            record for record in records
+            if databases.get(record["id"]) != database_id or record["id"] in keep
+        ]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in kept:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from notion_client import Client
+from dotenv import load_dotenv
+from profiling import span
+
+# Retrieved schemas are kept here so each database is probed at most once per run
+DEFAULT_SCHEMA_CACHE = ".notion-schema.json"
+
+_schemas = {}
+_cache_lock = threading.Lock()
+
+def _text(parts):
+    return "".join(
+        part.get('plain_text', (part.get('text') or {}).get('content', ''))
+        for part in parts or []
+    )
+
+def _date(value):
+    value = value or {}
+    start, end = value.get('start'), value.get('end')
+    return f"{start}/{end}" if end else start
+
+# Property type -> function reducing the property's value to a plain Python value
+VALUE_READERS = {
+    "number": lambda value: value,
+    "checkbox": lambda value: bool(value),
+    "select": lambda value: (value or {}).get('name'),
+    "title": _text,
+    "rich_text": _text,
+    "date": _date,
+}
+
+def utc_date(value):
+    """
+    Calendar date (YYYY-MM-DD) of a Notion date string, converting timestamps with an offset to
+    UTC so the same moment stored in different time zones compares equal. Naive timestamps are
+    taken as UTC, which is how the sync writes Garmin's GMT times.
+    """
+    if not value:
+        return ""
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return value[:10]
+    if moment.tzinfo:
+        moment = moment.astimezone(timezone.utc)
+    return moment.date().isoformat()
+
+def same_moment(old, new):
+    """
+    Whether two Notion date strings name the same moment, e.g. Garmin's naive GMT time as sent
+    and the offset form Notion returns for it.
+    """
+    def moment(value):
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    try:
+        return moment(old) == moment(new)
+    except (AttributeError, TypeError, ValueError):
+        return False
+
+def property_value(prop):
+    """
+    Reduce a Notion property (as returned by the API or as sent in a payload) to a plain value.
+    """
+    if not prop:
+        return None
+    prop_type = prop.get('type') or next((key for key in prop if key in VALUE_READERS), None)
+    if prop_type not in VALUE_READERS:
+        return None
+    return VALUE_READERS[prop_type](prop.get(prop_type))
+
+def compile_extractors(required_properties):
+    """
+    Build {name: extractor(properties)} for a pipeline's properties. Extractors return None
+    instead of raising when a property is missing from the page; a property that is present
+    but empty reads as None, "" for text or False for checkboxes.
+    """
+    def extractor(name, prop_type):
+        read = VALUE_READERS[prop_type]
+        def extract(properties):
+            prop = properties.get(name)
+            return read(prop.get(prop_type)) if prop else None
+        return extract
+    return {name: extractor(name, prop_type) for name, prop_type in required_properties.items()}
+
+def _load_cache(cache_path):
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_cache(cache_path, cache):
+    if not cache_path:
+        return
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, ensure_ascii=False)
+
+def get_schema(client, database_id, cache_path=DEFAULT_SCHEMA_CACHE, refresh=False):
+    """
+    Return {property name: type} for a database, from memory, the cache file or databases.retrieve.
+    """
+    if not refresh and database_id in _schemas:
+        return _schemas[database_id]
+
+    with _cache_lock:
+        cache = _load_cache(cache_path)
+    if refresh or database_id not in cache:
+        with span("notion.schema"):
+            database = client.databases.retrieve(database_id=database_id)
+        schema = {name: prop['type'] for name, prop in database['properties'].items()}
+        with _cache_lock:
+            cache = _load_cache(cache_path)
+            cache[database_id] = schema
+            _save_cache(cache_path, cache)
+
+    _schemas[database_id] = cache[database_id]
+    return _schemas[database_id]
+
+def validate_schema(schema, required_properties):
+    """
+    Return a list of problems: required properties that are missing or have the wrong type.
+    """
+    problems = []
+    for name, prop_type in required_properties.items():
+        if name not in schema:
+            problems.append(f"missing property '{name}' ({prop_type})")
+        elif schema[name] != prop_type:
+            problems.append(f"property '{name}' is {schema[name]}, expected {prop_type}")
+    return problems
+
+def ensure_schema(client, database_id, required_properties, create_missing=False, cache_path=DEFAULT_SCHEMA_CACHE):
+    """
+    Check a database against the properties a pipeline needs, optionally creating the missing ones.
+    Raises ValueError if the database still does not match.
+    """
+    schema = get_schema(client, database_id, cache_path)
+    missing = {
+        name: prop_type for name, prop_type in required_properties.items()
+        if name not in schema and prop_type != "title"  # a database has exactly one title property
+    }
+    if create_missing and missing:
+        client.databases.update(
+            database_id=database_id,
+            properties={name: {prop_type: {}} for name, prop_type in missing.items()}
+        )
+        print(f"Created properties in {database_id}: {', '.join(missing)}")
+        schema = get_schema(client, database_id, cache_path, refresh=True)
+    elif validate_schema(schema, required_properties) and cache_path:
+        # The cached copy may be stale, so confirm against Notion before failing
+        schema = get_schema(client, database_id, cache_path, refresh=True)
+
+    problems = validate_schema(schema, required_properties)
+    if problems:
+        raise ValueError(f"Notion database {database_id} does not match: {'; '.join(problems)}")
+    return schema
+
+def main():
+    load_dotenv()
+
+    from pipelines import PIPELINES, load_pipeline
+
+    parser = argparse.ArgumentParser(description="Check the Notion databases against the properties each pipeline needs.")
+    parser.add_argument("--create", action="store_true", help="add missing properties to the databases")
+    parser.add_argument("--cache", default=DEFAULT_SCHEMA_CACHE, help="schema cache file to refresh")
+    args = parser.parse_args()
+
+    client = Client(auth=os.getenv("NOTION_TOKEN"))
+    for name, (_, env_var) in PIPELINES.items():
+        database_id = os.getenv(env_var)
+        if not database_id:
+            continue
+        get_schema(client, database_id, args.cache, refresh=True)
+        try:
+            ensure_schema(client, database_id, load_pipeline(name).REQUIRED_PROPERTIES, args.create, args.cache)
+            print(f"{name}: OK")
+        except ValueError as e:
+            print(f"{name}: {e}")
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,28 @@
 from datetime import date, datetime
 from garminconnect import Garmin
 from notion_client import Client
+from notion_schema import DEFAULT_SCHEMA_CACHE, compile_extractors, ensure_schema, utc_date
+from profiling import span, profiled, add_profile_arguments
+from journal import DEFAULT_JOURNAL
+from sync_plan import changed_fields, new_plan, plan_create, plan_update, plan_archive, run_plan, add_plan_argument
+import argparse
+import hashlib
+import json
 import os
 
+# Properties the personal records database must have, with their Notion types
+REQUIRED_PROPERTIES = {
+    "Date": "date",
+    "Activity Type": "select",
+    "Record": "title",
+    "typeId": "number",
+    "PR": "checkbox",
+    "Value": "rich_text",
+    "Pace": "rich_text",
+}
+
+RECORD_FIELDS = compile_extractors(REQUIRED_PROPERTIES)
+
 def get_icon_for_record(activity_name):
     icon_map = {
         "1K": "🥇",
@@ -180,7 +200,7 @@ def get_record_by_date_and_name(client, database_id, activity_date, activity_nam
     )
     return query['results'][0] if query['results'] else None
 
-def update_record(client, page_id, activity_date, value, pace, activity_name, is_pr=True):
+def record_update(page_id, activity_date, value, pace, activity_name, is_pr=True):
     properties = {
         "Date": {"date": {"start": activity_date}},
         "PR": {"checkbox": is_pr}
@@ -195,18 +215,24 @@ def update_record(client, page_id, activity_date, value, pace, activity_name, is
     icon = get_icon_for_record(activity_name)
     cover = get_cover_for_record(activity_name)
 
-    try:
-        client.pages.update(
-            page_id=page_id,
-            properties=properties,
-            icon={"emoji": icon},
-            cover={"type": "external", "external": {"url": cover}}
-        )
-        
-    except Exception as e:
-        print(f"Error updating record: {e}")
-
-def write_new_record(client, database_id, activity_date, activity_type, activity_name, typeId, value, pace):
+    return {
+        "page_id": page_id,
+        "properties": properties,
+        "icon": {"emoji": icon},
+        "cover": {"type": "external", "external": {"url": cover}}
+    }
+
+def existing_page(client, database_id, page):
+    # Look up the record a planned create would make
+    properties = page['properties']
+    return get_record_by_date_and_name(client, database_id, RECORD_FIELDS['Date'](properties), RECORD_FIELDS['Record'](properties))
+
+def natural_key(properties):
+    # Identity of a record page for duplicate detection: one page per record and date
+    record_date = utc_date(RECORD_FIELDS['Date'](properties))
+    return ((RECORD_FIELDS['Record'](properties) or "").strip().lower(), record_date)
+
+def new_record_page(database_id, activity_date, activity_type, activity_name, typeId, value, pace):
     properties = {
         "Date": {"date": {"start": activity_date}},
         "Activity Type": {"select": {"name": activity_type}},
@@ -224,28 +250,27 @@ def write_new_record(client, database_id, activity_date, activity_type, activity
     icon = get_icon_for_record(activity_name)
     cover = get_cover_for_record(activity_name)
 
-    try:
-        client.pages.create(
-            parent={"database_id": database_id},
-            properties=properties,
-            icon={"emoji": icon},
-            cover={"type": "external", "external": {"url": cover}}
-        )
-    except Exception as e:
-        print(f"Error writing new record: {e}")
-
-def main():
-    garmin_email = os.getenv("GARMIN_EMAIL")
-    garmin_password = os.getenv("GARMIN_PASSWORD")
-    notion_token = os.getenv("NOTION_TOKEN")
-    database_id = os.getenv("NOTION_PR_DB_ID")
+    return {
+        "parent": {"database_id": database_id},
+        "properties": properties,
+        "icon": {"emoji": icon},
+        "cover": {"type": "external", "external": {"url": cover}}
+    }
 
-    garmin = Garmin(garmin_email, garmin_password)
-    garmin.login()
+def probe(garmin):
+    # Cheap change check for the scheduler: a hash of the current PR list
+    records = [
+        [record.get('typeId'), record.get('value'), record.get('prStartTimeGmtFormatted')]
+        for record in garmin.get_personal_record()
+    ]
+    return hashlib.sha256(json.dumps(sorted(records, key=str)).encode()).hexdigest()
 
-    client = Client(auth=notion_token)
+def build_plan(garmin, client, database_id, schema_cache=DEFAULT_SCHEMA_CACHE):
+    ensure_schema(client, database_id, REQUIRED_PROPERTIES, cache_path=schema_cache)
+    plan = new_plan("personal_records", database_id)
 
-    records = garmin.get_personal_record()
+    with span("garmin.fetch"):
+        records = garmin.get_personal_record()
     filtered_records = [record for record in records if record.get('typeId') != 16]
 
     for record in filtered_records:
@@ -253,41 +278,68 @@ def main():
         activity_type = format_activity_type(record.get('activityType'))
         activity_name = replace_activity_name_by_typeId(record.get('typeId'))
         typeId = record.get('typeId', 0)
-        value, pace = format_garmin_value(record.get('value', 0), activity_type, typeId)
+        label = f"{activity_type} - {activity_name}"
+        with span("build"):
+            value, pace = format_garmin_value(record.get('value', 0), activity_type, typeId)
+            new_page = new_record_page(database_id, activity_date, activity_type, activity_name, typeId, value, pace)
 
-        existing_pr_record = get_existing_record(client, database_id, activity_name)
-        existing_date_record = get_record_by_date_and_name(client, database_id, activity_date, activity_name)
+        with span("notion.lookup"):
+            existing_pr_record = get_existing_record(client, database_id, activity_name)
+            existing_date_record = get_record_by_date_and_name(client, database_id, activity_date, activity_name)
 
         if existing_date_record:
-            update_record(client, existing_date_record['id'], activity_date, value, pace, activity_name, True)
-            print(f"Updated existing record: {activity_type} - {activity_name}")
+            update = record_update(existing_date_record['id'], activity_date, value, pace, activity_name, True)
+            # Plan only real changes, so the summary counts the writes that will actually be sent
+            if changed_fields(existing_date_record['properties'], update['properties']):
+                plan_update(plan, existing_date_record, update, label, f"Updated existing record: {label}")
+            else:
+                print(f"No update needed: {label}")
         elif existing_pr_record:
-            # Add error handling here
-            try:
-                date_prop = existing_pr_record['properties']['Date']
-                if date_prop and date_prop.get('date') and date_prop['date'].get('start'):
-                    existing_date = date_prop['date']['start']
-                    
-                    if activity_date > existing_date:
-                        update_record(client, existing_pr_record['id'], existing_date, None, None, activity_name, False)
-                        print(f"Archived old record: {activity_type} - {activity_name}")
-                        
-                        write_new_record(client, database_id, activity_date, activity_type, activity_name, typeId, value, pace)
-                        print(f"Created new PR record: {activity_type} - {activity_name}")
-                    else:
-                        print(f"No update needed: {activity_type} - {activity_name}")
+            existing_date = RECORD_FIELDS['Date'](existing_pr_record['properties'])
+            if existing_date:
+                if activity_date > existing_date:
+                    archive = record_update(existing_pr_record['id'], existing_date, None, None, activity_name, False)
+                    # The new PR is only created once the old one is no longer flagged as PR
+                    archive_id = plan_archive(plan, existing_pr_record, archive, label, f"Archived old record: {label}")
+                    plan_create(plan, new_page, label, f"Created new PR record: {label}", depends_on=[archive_id])
                 else:
-                    # Handle case where date is missing or improperly formatted
-                    print(f"Warning: Record {activity_name} has invalid date format - updating anyway")
-                    update_record(client, existing_pr_record['id'], activity_date, value, pace, activity_name, True)
-            except (KeyError, TypeError) as e:
-                print(f"Error processing record {activity_name}: {e}")
-                print(f"Record data: {existing_pr_record['properties']}")
-                # Fallback - create new record if we can't process the existing one properly
-                write_new_record(client, database_id, activity_date, activity_type, activity_name, typeId, value, pace)
+                    print(f"No update needed: {label}")
+            else:
+                # Handle case where date is missing - update the existing record rather than duplicating it
+                print(f"Warning: Record {activity_name} has invalid date format - updating anyway")
+                update = record_update(existing_pr_record['id'], activity_date, value, pace, activity_name, True)
+                plan_update(plan, existing_pr_record, update, label)
         else:
-            write_new_record(client, database_id, activity_date, activity_type, activity_name, typeId, value, pace)
-            print(f"Successfully written new record: {activity_type} - {activity_name}")
+            plan_create(plan, new_page, label, f"Successfully written new record: {label}")
+
+    return plan
+
+def sync(garmin, client, database_id, plan_path=None, journal_path=DEFAULT_JOURNAL, schema_cache=DEFAULT_SCHEMA_CACHE):
+    # Failed record writes are reported without stopping the run, as they always were
+    return run_plan(
+        client, database_id, lambda: build_plan(garmin, client, database_id, schema_cache), plan_path, journal_path,
+        find_existing=lambda page: existing_page(client, database_id, page), strict=False
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync Garmin personal records to Notion.")
+    add_plan_argument(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    garmin_email = os.getenv("GARMIN_EMAIL")
+    garmin_password = os.getenv("GARMIN_PASSWORD")
+    notion_token = os.getenv("NOTION_TOKEN")
+    database_id = os.getenv("NOTION_PR_DB_ID")
+
+    with profiled(args.profile, args.profile_dir, "personal_records"):
+        with span("garmin.login"):
+            garmin = Garmin(garmin_email, garmin_password)
+            garmin.login()
+
+        client = Client(auth=notion_token)
+
+        sync(garmin, client, database_id, args.plan)
 
 if __name__ == '__main__':
     main()
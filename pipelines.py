@@ -0,0 +1,22 @@
+import importlib.util
+import os
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Pipeline name -> (script, environment variable holding its Notion database id)
+PIPELINES = {
+    "activities": ("garmin-activities.py", "NOTION_DB_ID"),
+    "personal_records": ("personal-records.py", "NOTION_PR_DB_ID"),
+    "daily_steps": ("daily-steps.py", "NOTION_STEPS_DB_ID"),
+    "sleep": ("sleep-data.py", "NOTION_SLEEP_DB_ID"),
+}
+
+def load_pipeline(name):
+    """
+    Import a pipeline script as a module (the script names are not valid module names).
+    """
+    script, _ = PIPELINES[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPT_DIR, script))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
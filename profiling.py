@@ -0,0 +1,143 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_PROFILE_DIR = "profile"
+PROFILE_MODES = ["spans", "cprofile", "sample"]
+
+# Seconds between stack samples in "sample" mode
+SAMPLE_INTERVAL = 0.005
+
+_enabled = False
+_spans = []
+_origin = time.perf_counter()
+
+@contextmanager
+def span(name):
+    """
+    Time a pipeline stage. Costs a single flag check when profiling is off.
+    """
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _spans.append((name, start - _origin, time.perf_counter() - start, threading.get_ident()))
+
+def stage_breakdown(spans):
+    """
+    Return {stage: {"count", "total", "max"}} in seconds, slowest stage first.
+    """
+    stages = {}
+    for name, _, duration, _ in spans:
+        stage = stages.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        stage["count"] += 1
+        stage["total"] += duration
+        stage["max"] = max(stage["max"], duration)
+    return dict(sorted(stages.items(), key=lambda item: item[1]["total"], reverse=True))
+
+def chrome_trace(spans):
+    """
+    Spans as Chrome trace events, which chrome://tracing, Perfetto and speedscope can open.
+    """
+    return {"traceEvents": [
+        {"name": name, "ph": "X", "ts": round(start * 1e6), "dur": round(duration * 1e6), "pid": os.getpid(), "tid": tid}
+        for name, start, duration, tid in spans
+    ]}
+
+class StackSampler:
+    """
+    Minimal sampling profiler: periodically records the stack of one thread as a collapsed
+    stack ("outer;inner count"), the text format flame graph tools and speedscope import.
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+@contextmanager
+def profiled(mode, output_dir, run_name):
+    """
+    Record stage spans (and optionally cProfile or stack samples) for the enclosed run,
+    then print a per-stage breakdown and write the reports to output_dir.
+    """
+    global _enabled
+    if not mode:
+        yield
+        return
+
+    _spans.clear()
+    _enabled = True
+    profiler = cProfile.Profile() if mode == "cprofile" else None
+    sampler = StackSampler(threading.get_ident()) if mode == "sample" else None
+    if profiler:
+        profiler.enable()
+    if sampler:
+        sampler.start()
+    try:
+        with span(f"run.{run_name}"):
+            yield
+    finally:
+        if profiler:
+            profiler.disable()
+        if sampler:
+            sampler.stop()
+        _enabled = False
+        write_reports(output_dir, run_name, profiler, sampler)
+
+def write_reports(output_dir, run_name, profiler=None, sampler=None):
+    os.makedirs(output_dir, exist_ok=True)
+    prefix = os.path.join(output_dir, f"{run_name}-{datetime.now().strftime('%Y%m%dT%H%M%S')}")
+    breakdown = stage_breakdown(_spans)
+
+    print(f"{'stage':<30} {'count':>7} {'total s':>9} {'max s':>8}")
+    for name, stage in breakdown.items():
+        print(f"{name:<30} {stage['count']:>7} {stage['total']:>9.3f} {stage['max']:>8.3f}")
+
+    with open(f"{prefix}-stages.json", "w", encoding="utf-8") as f:
+        json.dump(breakdown, f, indent=2)
+    with open(f"{prefix}-trace.json", "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(_spans), f)
+    if profiler:
+        profiler.dump_stats(f"{prefix}.prof")
+    if sampler:
+        with open(f"{prefix}-samples.txt", "w", encoding="utf-8") as f:
+            for stack, count in sampler.samples.most_common():
+                f.write(f"{stack} {count}\n")
+    print(f"Wrote profile to {prefix}-*")
+
+def add_profile_arguments(parser):
+    parser.add_argument(
+        "--profile", nargs="?", const="spans", choices=PROFILE_MODES,
+        help="time each pipeline stage; 'cprofile' or 'sample' also profile the code (default: spans)"
+    )
+    parser.add_argument("--profile-dir", default=DEFAULT_PROFILE_DIR, help="directory for profile reports")
@@ -0,0 +1,38 @@
+import threading
+import time
+import httpx
+from notion_client import Client
+
+# Notion allows an average of three requests per second per integration
+NOTION_REQUESTS_PER_SECOND = 3
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: acquire() blocks until a request may be sent.
+    """
+
+    def __init__(self, rate=NOTION_REQUESTS_PER_SECOND, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def rate_limited_client(notion_token, bucket):
+    """
+    Notion client whose every HTTP request first takes a token from bucket.
+    """
+    http_client = httpx.Client(event_hooks={"request": [lambda request: bucket.acquire()]})
+    return Client(auth=notion_token, client=http_client)
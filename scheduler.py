@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+from garminconnect import Garmin, GarminConnectAuthenticationError
+from notion_client import Client
+from dotenv import load_dotenv
+from journal import DEFAULT_JOURNAL
+from notion_schema import DEFAULT_SCHEMA_CACHE
+from pipelines import PIPELINES, load_pipeline
+from profiling import span, profiled, add_profile_arguments
+
+DEFAULT_STATE_FILE = ".sync-state.json"
+DEFAULT_TOKEN_STORE = "~/.garminconnect"
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_state(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+def garmin_login(email, password, tokenstore):
+    """
+    Log in with cached Garmin tokens when possible so frequent runs do not hit the SSO login.
+    tokenstore is a token directory, or the encoded token string printed by --dump-tokens
+    (garminconnect treats strings longer than 512 characters as tokens, not paths).
+    Only missing or rejected tokens fall back to the password login; network errors and
+    rate limiting are raised, so a bad moment does not turn into a burst of SSO logins.
+    """
+    is_token_string = len(tokenstore) > 512
+    if not is_token_string:
+        tokenstore = os.path.expanduser(tokenstore)
+    try:
+        garmin = Garmin()
+        garmin.login(tokenstore)
+        return garmin
+    except (FileNotFoundError, GarminConnectAuthenticationError) as e:
+        print(f"Cached Garmin tokens unusable, logging in with password: {e}")
+        garmin = Garmin(email, password)
+        garmin.login()
+        if not is_token_string:
+            garmin.garth.dump(tokenstore)
+        return garmin
+
+def run_pipelines(garmin, client, database_ids, state, force=False, only=None,
+                  journal_path=DEFAULT_JOURNAL, schema_cache=DEFAULT_SCHEMA_CACHE):
+    """
+    Probe each configured pipeline and sync the ones whose probe changed since the last run.
+    Updates state in place and returns the names of the pipelines that were synced. A probe
+    is only recorded once its sync had no failed writes; if any pipeline failed, the others
+    still run and RuntimeError is raised at the end.
+    """
+    synced = []
+    failed = []
+    for name in PIPELINES:
+        database_id = database_ids.get(name)
+        if not database_id or (only and name not in only):
+            continue
+
+        pipeline = load_pipeline(name)
+        try:
+            with span(f"probe.{name}"):
+                probe = pipeline.probe(garmin)
+        except Exception as e:
+            print(f"Probe failed for {name}, syncing anyway: {e}")
+            probe = None
+
+        if not force and probe is not None and state.get(name) == probe:
+            print(f"No upstream changes for {name}")
+            continue
+
+        print(f"Syncing {name}")
+        try:
+            with span(f"pipeline.{name}"):
+                plan = pipeline.sync(garmin, client, database_id, journal_path=journal_path, schema_cache=schema_cache)
+        except Exception as e:
+            print(f"Sync failed for {name}: {e}")
+            failed.append(name)
+            continue
+        if plan.get("failures"):
+            failed.append(name)
+            continue
+        if probe is not None:
+            state[name] = probe
+        synced.append(name)
+
+    if failed:
+        raise RuntimeError(f"Sync failed for {', '.join(failed)}")
+    return synced
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Sync only the pipelines with new Garmin data.")
+    parser.add_argument("--state", default=DEFAULT_STATE_FILE, help="file holding the last probe of each pipeline")
+    parser.add_argument("--tokenstore", default=os.getenv("GARMIN_TOKENS") or DEFAULT_TOKEN_STORE,
+                        help="directory for cached Garmin tokens, or a token string (default: $GARMIN_TOKENS)")
+    parser.add_argument("--dump-tokens", action="store_true", help="log in and print a token string to store as the GARMIN_TOKENS secret")
+    parser.add_argument("--force", action="store_true", help="sync every pipeline regardless of its probe")
+    parser.add_argument("--only", nargs="+", choices=list(PIPELINES), help="restrict the run to these pipelines")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    if args.dump_tokens:
+        garmin = Garmin(os.getenv("GARMIN_EMAIL"), os.getenv("GARMIN_PASSWORD"))
+        garmin.login()
+        print(garmin.garth.dumps())
+        return
+
+    with profiled(args.profile, args.profile_dir, "scheduler"):
+        with span("garmin.login"):
+            garmin = garmin_login(os.getenv("GARMIN_EMAIL"), os.getenv("GARMIN_PASSWORD"), args.tokenstore)
+        client = Client(auth=os.getenv("NOTION_TOKEN"))
+        database_ids = {name: os.getenv(env_var) for name, (_, env_var) in PIPELINES.items()}
+
+        state = load_state(args.state)
+        try:
+            run_pipelines(garmin, client, database_ids, state, args.force, args.only)
+        finally:
+            save_state(args.state, state)
+
+if __name__ == '__main__':
+    main()
@@ -2,12 +2,38 @@ from datetime import datetime, timedelta
 from garminconnect import Garmin
 from notion_client import Client
 from dotenv import load_dotenv, dotenv_values
+from notion_schema import DEFAULT_SCHEMA_CACHE, compile_extractors, ensure_schema
+from profiling import span, profiled, add_profile_arguments
+from journal import DEFAULT_JOURNAL
+from sync_plan import new_plan, plan_create, run_plan, add_plan_argument
+import argparse
 import pytz
 import os
 
 # Constants
 local_tz = pytz.timezone("Asia/Kuala_Lumpur")
 
+# Properties the sleep database must have, with their Notion types
+REQUIRED_PROPERTIES = {
+    "Date": "title",
+    "Times": "rich_text",
+    "Long Date": "date",
+    "Full Date/Time": "date",
+    "Total Sleep (h)": "number",
+    "Light Sleep (h)": "number",
+    "Deep Sleep (h)": "number",
+    "REM Sleep (h)": "number",
+    "Awake Time (h)": "number",
+    "Total Sleep": "rich_text",
+    "Light Sleep": "rich_text",
+    "Deep Sleep": "rich_text",
+    "REM Sleep": "rich_text",
+    "Awake Time": "rich_text",
+    "Resting HR": "number",
+}
+
+SLEEP_FIELDS = compile_extractors(REQUIRED_PROPERTIES)
+
 # Load environment variables
 load_dotenv()
 CONFIG = dotenv_values()
@@ -51,10 +77,18 @@ def sleep_data_exists(client, database_id, sleep_date):
     results = query.get('results', [])
     return results[0] if results else None
 
-def create_sleep_data(client, database_id, sleep_data, skip_zero_sleep=True):
+def existing_page(client, database_id, page):
+    # Look up the entry a planned create would make
+    return sleep_data_exists(client, database_id, SLEEP_FIELDS['Long Date'](page['properties']))
+
+def natural_key(properties):
+    # Identity of a sleep page for duplicate detection: one entry per night
+    return ((SLEEP_FIELDS['Long Date'](properties) or "")[:10],)
+
+def sleep_page(database_id, sleep_data, skip_zero_sleep=True):
     daily_sleep = sleep_data.get('dailySleepDTO', {})
     if not daily_sleep:
-        return
+        return None
     
     sleep_date = daily_sleep.get('calendarDate', "Unknown Date")
     total_sleep = sum(
@@ -63,7 +97,7 @@ def create_sleep_data(client, database_id, sleep_data, skip_zero_sleep=True):
     
     if skip_zero_sleep and total_sleep == 0:
         print(f"Skipping sleep data for {sleep_date} as total sleep is 0")
-        return
+        return None
 
     properties = {
         "Date": {"title": [{"text": {"content": format_date_for_name(sleep_date)}}]},
@@ -83,29 +117,61 @@ def create_sleep_data(client, database_id, sleep_data, skip_zero_sleep=True):
         "Resting HR": {"number": sleep_data.get('restingHeartRate', 0)}
     }
     
-    client.pages.create(parent={"database_id": database_id}, properties=properties, icon={"emoji": "😴"})
-    print(f"Created sleep entry for: {sleep_date}")
+    return {"parent": {"database_id": database_id}, "properties": properties, "icon": {"emoji": "😴"}}
 
-def main():
-    # Load environment variables again (redundant if already done earlier)
-    load_dotenv()
+def probe(garmin):
+    # Cheap change check for the scheduler: whether today's sleep has been finalized
+    today = datetime.today().date().isoformat()
+    daily_sleep = (garmin.get_sleep_data(today) or {}).get('dailySleepDTO') or {}
+    return [daily_sleep.get('calendarDate'), daily_sleep.get('sleepEndTimestampGMT')]
 
-    # Initialize clients
-    garmin = Garmin(os.getenv("GARMIN_EMAIL"), os.getenv("GARMIN_PASSWORD"))
-    garmin.login()
-    client = Client(auth=os.getenv("NOTION_TOKEN"))
-    database_id = os.getenv("NOTION_SLEEP_DB_ID")
+def build_plan(garmin, client, database_id, schema_cache=DEFAULT_SCHEMA_CACHE):
+    ensure_schema(client, database_id, REQUIRED_PROPERTIES, cache_path=schema_cache)
+    plan = new_plan("sleep", database_id)
 
     # Fetch last 7 days of sleep data
-    sleep_data_list = get_sleep_data_range(garmin, days_back=7)
+    with span("garmin.fetch"):
+        sleep_data_list = get_sleep_data_range(garmin, days_back=7)
 
     for data in sleep_data_list:
         sleep_date = data.get('dailySleepDTO', {}).get('calendarDate')
         if sleep_date:
-            if not sleep_data_exists(client, database_id, sleep_date):
-                create_sleep_data(client, database_id, data, skip_zero_sleep=True)
+            with span("notion.lookup"):
+                existing_sleep = sleep_data_exists(client, database_id, sleep_date)
+            if not existing_sleep:
+                with span("build"):
+                    page = sleep_page(database_id, data, skip_zero_sleep=True)
+                if page:
+                    plan_create(plan, page, sleep_date, f"Created sleep entry for: {sleep_date}")
             else:
                 print(f"Sleep data already exists for: {sleep_date}")
 
+    return plan
+
+def sync(garmin, client, database_id, plan_path=None, journal_path=DEFAULT_JOURNAL, schema_cache=DEFAULT_SCHEMA_CACHE):
+    return run_plan(
+        client, database_id, lambda: build_plan(garmin, client, database_id, schema_cache), plan_path, journal_path,
+        find_existing=lambda page: existing_page(client, database_id, page)
+    )
+
+def main():
+    # Load environment variables again (redundant if already done earlier)
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Sync Garmin sleep data to Notion.")
+    add_plan_argument(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    with profiled(args.profile, args.profile_dir, "sleep"):
+        # Initialize clients
+        with span("garmin.login"):
+            garmin = Garmin(os.getenv("GARMIN_EMAIL"), os.getenv("GARMIN_PASSWORD"))
+            garmin.login()
+        client = Client(auth=os.getenv("NOTION_TOKEN"))
+        database_id = os.getenv("NOTION_SLEEP_DB_ID")
+
+        sync(garmin, client, database_id, args.plan)
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,253 @@
+import argparse
+import json
+import sys
+from notion_client import Client
+from dotenv import load_dotenv
+from notion_schema import property_value, same_moment
+from journal import DEFAULT_JOURNAL, operation_id, load_journal, record_pending, record_done, record_failed, unfinished, truncate
+from profiling import span
+from rate_limit import NOTION_REQUESTS_PER_SECOND
+import os
+
+class PlanApplyError(RuntimeError):
+    """
+    Raised after a plan was applied if any of its writes failed.
+    """
+
+def new_plan(pipeline, database_id):
+    return {
+        "pipeline": pipeline,
+        "database_id": database_id,
+        "creates": [],
+        "updates": [],
+        "archives": []
+    }
+
+def changed_fields(existing_props, properties):
+    """
+    Return {name: [old, new]} for every property in the payload that differs from the existing page.
+    """
+    changes = {}
+    for name, prop in properties.items():
+        old = property_value(existing_props.get(name))
+        new = property_value(prop)
+        if old != new and not same_moment(old, new):
+            changes[name] = [old, new]
+    return changes
+
+def plan_create(plan, page, label, message=None, depends_on=()):
+    """
+    Plan a new page. depends_on lists the ids of planned writes that must succeed first;
+    if one of them fails the create is held back for the next run.
+    """
+    entry = {"label": label, "page": page, "message": message}
+    if depends_on:
+        entry["depends_on"] = list(depends_on)
+    plan["creates"].append(entry)
+
+def plan_update(plan, existing_page, update, label, message=None):
+    plan["updates"].append({
+        "page_id": existing_page['id'],
+        "label": label,
+        "changes": changed_fields(existing_page.get('properties', {}), update.get('properties', {})),
+        "update": update,
+        "message": message
+    })
+
+def plan_archive(plan, existing_page, update, label, message=None):
+    """
+    Plan retiring an existing page. Returns the write's id, for a create's depends_on.
+    """
+    entry = {
+        "page_id": existing_page['id'],
+        "label": label,
+        "update": update,
+        "message": message
+    }
+    plan["archives"].append(entry)
+    return operation_id(plan["database_id"], "archive", entry)
+
+def summarize(plan):
+    writes = len(plan["creates"]) + len(plan["updates"]) + len(plan["archives"])
+    return {
+        "creates": len(plan["creates"]),
+        "updates": len(plan["updates"]),
+        "archives": len(plan["archives"]),
+        "estimated_seconds": round(writes / NOTION_REQUESTS_PER_SECOND, 1)
+    }
+
+def write_plan(plan, path):
+    plan = dict(plan, summary=summarize(plan))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=2, ensure_ascii=False)
+    print(f"Wrote plan for {plan['pipeline']} to {path}: {plan['summary']}")
+
+def load_plan(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def plan_operations(plan):
+    """
+    Yield (kind, entry) in the order writes must be sent: archives first, so a create
+    that depends on one only goes out once it succeeded.
+    """
+    for entry in plan["archives"]:
+        yield "archive", entry
+    for entry in plan["updates"]:
+        yield "update", entry
+    for entry in plan["creates"]:
+        yield "create", entry
+
+def apply_operation(client, kind, entry):
+    with span(f"notion.{kind}"):
+        if kind == "create":
+            return client.pages.create(**entry["page"])
+        return client.pages.update(**entry["update"])
+
+def _send(client, database_id, operations, journal_path, find_existing=None):
+    """
+    Send (kind, entry) writes in order, journaling each one when journal_path is set. Repeats
+    of a write are sent once, a write whose depends_on includes an unconfirmed write is held
+    back, and a create is skipped if find_existing(page) finds it already in Notion.
+    Returns the ids of the writes left unconfirmed.
+    """
+    sent = set()
+    unconfirmed = []
+    for kind, entry in operations:
+        op_id = operation_id(database_id, kind, entry)
+        if op_id in sent:
+            continue
+        sent.add(op_id)
+
+        if journal_path:
+            record_pending(journal_path, op_id, database_id, kind, entry)
+        if set(entry.get("depends_on", ())) & set(unconfirmed):
+            print(f"Holding back {kind} for {entry['label']}: a write it depends on failed")
+            if journal_path:
+                record_failed(journal_path, op_id, "a write it depends on failed")
+            unconfirmed.append(op_id)
+            continue
+
+        try:
+            existing = find_existing(entry["page"]) if kind == "create" and find_existing else None
+            result = existing or apply_operation(client, kind, entry)
+        except Exception as e:
+            print(f"Error applying {kind} for {entry['label']}: {e}")
+            if journal_path:
+                record_failed(journal_path, op_id, e)
+            unconfirmed.append(op_id)
+            continue
+        if journal_path:
+            record_done(journal_path, op_id, (result or {}).get("id"))
+        if existing:
+            print(f"Interrupted {kind} for {entry['label']} had already reached Notion")
+        elif entry.get("message"):
+            print(entry["message"])
+    return unconfirmed
+
+def replay_journal(client, database_id, journal_path=DEFAULT_JOURNAL, find_existing=None):
+    """
+    Finish the writes an interrupted run left unconfirmed for database_id, without rebuilding a
+    plan: archives, then updates, then creates, each create only if find_existing(page) does not
+    find it already in Notion. Raises PlanApplyError if any of them still fails, since a plan
+    built on top of them could send a create twice.
+    """
+    if not journal_path:
+        return
+    pending = unfinished(load_journal(journal_path), database_id)
+    if not pending:
+        return
+    print(f"Replaying {len(pending)} unfinished writes for {database_id}")
+    order = {"archive": 0, "update": 1, "create": 2}
+    operations = sorted(((state["kind"], state["entry"]) for state in pending.values()), key=lambda op: order[op[0]])
+    unconfirmed = _send(client, database_id, operations, journal_path, find_existing)
+    truncate(journal_path, database_id, keep=unconfirmed)
+    if unconfirmed:
+        raise PlanApplyError(f"{len(unconfirmed)} unfinished writes could not be replayed for {database_id}")
+
+def apply_plan(client, plan, journal_path=DEFAULT_JOURNAL, strict=True):
+    """
+    Send a plan's writes, journaling each one so an interrupted run can be replayed.
+    A failed write is reported and the rest are still sent, except creates that depend on it;
+    the number of failures is stored in plan["failures"] and, when strict, raised as
+    PlanApplyError at the end.
+    """
+    database_id = plan["database_id"]
+    unconfirmed = _send(client, database_id, plan_operations(plan), journal_path)
+    if journal_path:
+        # Only this run's unconfirmed writes stay, for the next run to replay
+        truncate(journal_path, database_id, keep=unconfirmed)
+
+    failures = len(unconfirmed)
+    plan["failures"] = failures
+    if failures and strict:
+        raise PlanApplyError(f"{failures} writes failed for {plan['pipeline']}")
+    return failures
+
+def run_plan(client, database_id, build, plan_path=None, journal_path=DEFAULT_JOURNAL, find_existing=None, strict=True):
+    """
+    Build a pipeline's plan with build() and apply it, or only save it to plan_path when given.
+    Writes left unconfirmed by an interrupted run are replayed first, so the plan is built
+    from the state they leave behind. Returns the plan.
+    """
+    if plan_path:
+        plan = build()
+        write_plan(plan, plan_path)
+        return plan
+    replay_journal(client, database_id, journal_path, find_existing)
+    plan = build()
+    apply_plan(client, plan, journal_path, strict)
+    return plan
+
+def add_plan_argument(parser):
+    parser.add_argument(
+        "--plan", metavar="PATH",
+        help="compute the creates, updates and archives without writing to Notion and save them as JSON to PATH"
+    )
+
+def main():
+    load_dotenv()
+
+    from pipelines import PIPELINES, load_pipeline
+
+    parser = argparse.ArgumentParser(description="Apply a sync plan produced with --plan, or finish an interrupted run.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    apply_parser = subparsers.add_parser("apply", help="send the writes recorded in one or more plan files")
+    apply_parser.add_argument("plans", nargs="+", metavar="PLAN")
+    apply_parser.add_argument("--journal", default=DEFAULT_JOURNAL, help="write-ahead journal used to resume interrupted runs")
+    resume_parser = subparsers.add_parser("resume", help="only replay the writes an interrupted run left unconfirmed")
+    resume_parser.add_argument("--journal", default=DEFAULT_JOURNAL, help="write-ahead journal to replay")
+    args = parser.parse_args()
+
+    client = Client(auth=os.getenv("NOTION_TOKEN"))
+
+    def find_existing(pipeline, database_id):
+        existing_page = load_pipeline(pipeline).existing_page
+        return lambda page: existing_page(client, database_id, page)
+
+    failures = 0
+    if args.command == "resume":
+        for name, (_, env_var) in PIPELINES.items():
+            database_id = os.getenv(env_var)
+            if not database_id:
+                continue
+            try:
+                replay_journal(client, database_id, args.journal, find_existing(name, database_id))
+            except PlanApplyError as e:
+                print(f"{name}: {e}")
+                failures += 1
+        if failures:
+            sys.exit(f"Unfinished writes remain for {failures} databases")
+        return
+
+    for path in args.plans:
+        plan = load_plan(path)
+        replay_journal(client, plan["database_id"], args.journal, find_existing(plan["pipeline"], plan["database_id"]))
+        print(f"Applying plan for {plan['pipeline']}: {summarize(plan)}")
+        failures += apply_plan(client, plan, args.journal, strict=False)
+
+    if failures:
+        sys.exit(f"{failures} writes failed")
+
+if __name__ == '__main__':
+    main()
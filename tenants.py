@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from rate_limit import TokenBucket, rate_limited_client
+from pipelines import PIPELINES
+from scheduler import DEFAULT_TOKEN_STORE, garmin_login, load_state, save_state, run_pipelines
+
+DEFAULT_CONFIG = "tenants.json"
+DEFAULT_STATE_DIR = ".sync-state"
+
+_current = threading.local()
+
+class TenantOutput:
+    """
+    Stdout wrapper that prefixes every line printed from a tenant's worker thread with the
+    tenant name, so the pipelines' progress and errors stay attributable when tenants run
+    in parallel. Lines are buffered per thread and written whole.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        tenant = getattr(_current, "tenant", None)
+        if tenant is None:
+            with self.lock:
+                return self.stream.write(text)
+        _current.buffer = getattr(_current, "buffer", "") + text
+        *lines, _current.buffer = _current.buffer.split("\n")
+        if lines:
+            with self.lock:
+                self.stream.write("".join(f"[{tenant}] {line}\n" for line in lines))
+        return len(text)
+
+    def flush(self):
+        with self.lock:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+def resolve(value):
+    """
+    Config values starting with "$" are read from that environment variable, so secrets stay out of the file.
+    """
+    if isinstance(value, str) and value.startswith("$"):
+        return os.getenv(value[1:])
+    return value
+
+def load_tenants(path):
+    """
+    Load the tenant config:
+    {"workers": 4, "tenants": [{"name": ..., "garmin_email": ..., "garmin_password": "$ENV_VAR",
+      "notion_token": "$ENV_VAR", "databases": {"activities": ..., "personal_records": ..., ...}}]}
+    """
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+
+    tenants = []
+    names = set()
+    for tenant in config.get("tenants", []):
+        # Names key each tenant's state and token files, so they must be unique plain file names
+        name = tenant.get("name")
+        if not name or name in (".", "..") or os.path.basename(name) != name:
+            raise ValueError(f"Invalid tenant name: {name!r}")
+        if tenant["name"] in names:
+            raise ValueError(f"Duplicate tenant name: {tenant['name']}")
+        names.add(tenant["name"])
+        unknown = set(tenant.get("databases", {})) - set(PIPELINES)
+        if unknown:
+            raise ValueError(f"Tenant {tenant.get('name')} has unknown pipelines: {', '.join(sorted(unknown))}")
+        tenants.append({
+            "name": tenant["name"],
+            "garmin_email": resolve(tenant.get("garmin_email")),
+            "garmin_password": resolve(tenant.get("garmin_password")),
+            "notion_token": resolve(tenant.get("notion_token")),
+            "databases": {name: resolve(database_id) for name, database_id in tenant.get("databases", {}).items()},
+        })
+    return config.get("workers", 4), tenants
+
+def sync_tenant(tenant, bucket, state_dir, tokenstore_dir, force=False):
+    """
+    Sync one tenant with its own Garmin token cache, probe state, write journal and schema cache.
+    Everything printed meanwhile from this thread is prefixed with the tenant name.
+    """
+    _current.tenant = tenant["name"]
+    try:
+        return _sync_tenant(tenant, bucket, state_dir, tokenstore_dir, force)
+    finally:
+        if getattr(_current, "buffer", ""):
+            print()
+        _current.tenant = None
+
+def _sync_tenant(tenant, bucket, state_dir, tokenstore_dir, force):
+    garmin = garmin_login(
+        tenant["garmin_email"], tenant["garmin_password"],
+        os.path.join(tokenstore_dir, tenant["name"])
+    )
+    client = rate_limited_client(tenant["notion_token"], bucket)
+
+    state_path = os.path.join(state_dir, f"{tenant['name']}.json")
+    journal_path = os.path.join(state_dir, f"{tenant['name']}-journal.jsonl")
+    schema_cache = os.path.join(state_dir, f"{tenant['name']}-schema.json")
+    state = load_state(state_path)
+    try:
+        return run_pipelines(
+            garmin, client, tenant["databases"], state, force,
+            journal_path=journal_path, schema_cache=schema_cache
+        )
+    finally:
+        save_state(state_path, state)
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Sync every tenant in the config on a shared worker pool.")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="tenant config file")
+    parser.add_argument("--state-dir", default=DEFAULT_STATE_DIR, help="directory for per-tenant checkpoint state")
+    parser.add_argument("--tokenstore", default=DEFAULT_TOKEN_STORE, help="directory for per-tenant Garmin tokens")
+    parser.add_argument("--force", action="store_true", help="sync every pipeline regardless of its probe")
+    args = parser.parse_args()
+
+    sys.stdout = TenantOutput(sys.stdout)
+    workers, tenants = load_tenants(args.config)
+    os.makedirs(args.state_dir, exist_ok=True)
+    tokenstore_dir = os.path.expanduser(args.tokenstore)
+
+    # Notion rate limits are per integration, so tenants sharing a token share a bucket
+    buckets = {}
+    for tenant in tenants:
+        buckets.setdefault(tenant["notion_token"], TokenBucket())
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(sync_tenant, tenant, buckets[tenant["notion_token"]], args.state_dir, tokenstore_dir, args.force): tenant["name"]
+            for tenant in tenants
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                synced = future.result()
+                print(f"Tenant {name} done: {', '.join(synced) or 'nothing to sync'}")
+            except Exception as e:
+                print(f"Tenant {name} failed: {e}")
+                failed.append(name)
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubPages:
+    def __init__(self, fail_creates=0, fail_updates=0):
+        self.created = []
+        self.updated = []
+        self.fail_creates = fail_creates
+        self.fail_updates = fail_updates
+
+    def create(self, **page):
+        if self.fail_creates:
+            self.fail_creates -= 1
+            raise TimeoutError("timed out")
+        self.created.append(page)
+        return {"id": f"page-{len(self.created)}"}
+
+    def update(self, **update):
+        if self.fail_updates:
+            self.fail_updates -= 1
+            raise TimeoutError("timed out")
+        self.updated.append(update)
+        return {"id": update["page_id"]}
+
+
+class StubClient:
+    def __init__(self, fail_creates=0, fail_updates=0):
+        self.pages = StubPages(fail_creates, fail_updates)
+
+
+@pytest.fixture
+def client():
+    return StubClient()
@@ -0,0 +1,97 @@
+from compact import compact_database, find_duplicates
+from pipelines import load_pipeline
+
+activities = load_pipeline("activities")
+daily_steps = load_pipeline("daily_steps")
+
+
+def activity(page_id, name, start, created="2024-01-01T00:00:00.000Z", pr=False):
+    return {
+        "id": page_id,
+        "created_time": created,
+        "properties": {
+            "Date": {"type": "date", "date": {"start": start} if start else None},
+            "Activity Type": {"type": "select", "select": {"name": "Running"}},
+            "Activity Name": {"type": "title", "title": [{"plain_text": name}] if name else []},
+            "PR": {"type": "checkbox", "checkbox": pr},
+        },
+    }
+
+
+def test_groups_by_normalized_name_and_keeps_oldest():
+    pages = [
+        activity("new", "ENTERTAINMENT Run", "2024-01-01T10:00:00.000+00:00", created="2024-02-01T00:00:00.000Z"),
+        activity("old", " netflix run", "2024-01-01T10:00:00.000+00:00", created="2024-01-01T00:00:00.000Z"),
+        activity("other", "Ride", "2024-01-01T10:00:00.000+00:00"),
+    ]
+
+    duplicates, skipped = find_duplicates(pages, activities.natural_key)
+
+    assert [(survivor["id"], [page["id"] for page in removed]) for _, survivor, removed in duplicates] == [("old", ["new"])]
+    assert skipped == []
+
+
+def test_prefers_page_flagged_as_pr():
+    pages = [
+        activity("oldest", "Run", "2024-01-01T10:00:00", created="2024-01-01T00:00:00.000Z"),
+        activity("flagged", "Run", "2024-01-01T10:00:00", created="2024-03-01T00:00:00.000Z", pr=True),
+    ]
+
+    (_, survivor, removed), = find_duplicates(pages, activities.natural_key)[0]
+
+    assert survivor["id"] == "flagged"
+    assert [page["id"] for page in removed] == ["oldest"]
+
+
+def test_same_moment_in_different_time_zones_is_one_group():
+    pages = [
+        activity("utc", "Run", "2024-01-02T02:00:00.000+00:00"),
+        activity("shifted", "Run", "2024-01-01T21:00:00.000-05:00"),
+    ]
+
+    duplicates, _ = find_duplicates(pages, activities.natural_key)
+
+    assert len(duplicates) == 1
+
+
+def test_pages_with_empty_key_are_skipped_not_grouped():
+    pages = [activity(f"dateless-{i}", "Run", None) for i in range(3)] + [activity("unnamed", "", "2024-01-01")]
+
+    duplicates, skipped = find_duplicates(pages, activities.natural_key)
+    steps_duplicates, steps_skipped = find_duplicates(pages[:3], daily_steps.natural_key)
+
+    assert duplicates == [] and steps_duplicates == []
+    assert len(skipped) == 4 and len(steps_skipped) == 3
+
+
+class PagedClient:
+    def __init__(self, pages, page_size=2):
+        self.batches = [pages[i:i + page_size] for i in range(0, len(pages), page_size)]
+        self.archived = []
+        self.databases = self
+        self.pages = self
+
+    def query(self, database_id, page_size, start_cursor=None):
+        index = int(start_cursor or 0)
+        has_more = index + 1 < len(self.batches)
+        return {"results": self.batches[index], "has_more": has_more, "next_cursor": str(index + 1) if has_more else None}
+
+    def update(self, page_id, archived):
+        self.archived.append(page_id)
+
+
+def test_compact_database_reports_without_archiving_unless_applied():
+    pages = [
+        activity("a", "Run", "2024-01-01T10:00:00", created="2024-01-01T00:00:00.000Z"),
+        activity("b", "Run", "2024-01-01T10:00:00", created="2024-01-02T00:00:00.000Z"),
+        activity("c", "Run", None),
+    ]
+
+    dry = PagedClient(pages)
+    report = compact_database(dry, "db", activities.natural_key)
+    applied = PagedClient(pages)
+    compact_database(applied, "db", activities.natural_key, apply=True)
+
+    assert report == {"groups": [{"key": ["2024-01-01", "running", "run"], "survivor": "a", "removed": ["b"]}], "skipped": ["c"]}
+    assert dry.archived == []
+    assert applied.archived == ["b"]
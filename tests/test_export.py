@@ -0,0 +1,95 @@
+import csv
+
+import pytest
+
+from export import export_dataset, load_export_state
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+REQUIRED = {"Date": "date", "Steps": "number"}
+
+
+def day(page_id, date, steps):
+    return {
+        "id": page_id,
+        "properties": {
+            "Date": {"type": "date", "date": {"start": date}},
+            "Steps": {"type": "number", "number": steps},
+        },
+    }
+
+
+def crash_after(pages, count):
+    for page in pages[:count]:
+        yield page
+    raise TimeoutError("timed out")
+
+
+def export(pages, tmp_path, formats, state):
+    return export_dataset(pages, "daily_steps", REQUIRED, str(tmp_path), formats, state, str(tmp_path / "state.json"), row_group_size=2)
+
+
+def csv_ids(tmp_path):
+    with open(tmp_path / "daily_steps.csv", encoding="utf-8") as f:
+        return [row["Page ID"] for row in csv.DictReader(f)]
+
+
+def parquet_ids(tmp_path):
+    return sorted(pq.read_table(tmp_path / "daily_steps").column("Page ID").to_pylist())
+
+
+PAGES = [day("a", "2024-01-01", 1), day("b", "2024-01-02", 2), day("c", "2024-01-02", 3), day("d", "2024-01-03", 4)]
+
+
+def test_interrupted_run_resumes_without_duplicates(tmp_path):
+    with pytest.raises(TimeoutError):
+        export(crash_after(PAGES, 3), tmp_path, ["csv", "parquet"], {})
+
+    # The CSV kept its first chunk; the partial Parquet part was discarded
+    state = load_export_state(str(tmp_path / "state.json"))
+    assert csv_ids(tmp_path) == ["a", "b"]
+    assert "parquet" not in state
+    assert not list((tmp_path / "daily_steps").iterdir())
+
+    counts = export(PAGES, tmp_path, ["csv", "parquet"], state)
+
+    assert counts == {"csv": 2, "parquet": 4}
+    assert csv_ids(tmp_path) == ["a", "b", "c", "d"]
+    assert parquet_ids(tmp_path) == ["a", "b", "c", "d"]
+
+
+def test_formats_keep_separate_cursors(tmp_path):
+    state = {}
+    export(PAGES[:2], tmp_path, ["csv"], state)
+
+    counts = export(PAGES, tmp_path, ["csv", "parquet"], state)
+
+    assert counts == {"csv": 2, "parquet": 4}
+    assert parquet_ids(tmp_path) == ["a", "b", "c", "d"]
+
+
+def test_crash_never_saves_parquet_cursor_past_unwritten_rows(tmp_path):
+    state = {}
+    export([day("a", "2024-01-01", 1)], tmp_path, ["csv", "parquet"], state)
+
+    # b shares a's date, so it extends the existing Parquet cursor in the crashed run
+    pages = [day("a", "2024-01-01", 1), day("b", "2024-01-01", 2), day("c", "2024-01-02", 3)]
+    with pytest.raises(TimeoutError):
+        export(crash_after(pages, 3), tmp_path, ["csv", "parquet"], state)
+
+    state = load_export_state(str(tmp_path / "state.json"))
+    assert state["parquet"]["daily_steps"] == {"date": "2024-01-01", "ids": ["a"]}
+
+    export(pages, tmp_path, ["csv", "parquet"], state)
+
+    assert csv_ids(tmp_path) == ["a", "b", "c"]
+    assert parquet_ids(tmp_path) == ["a", "b", "c"]
+
+
+def test_exports_in_the_same_second_keep_both_parts(tmp_path):
+    state = {}
+    export(PAGES[:2], tmp_path, ["parquet"], state)
+    export(PAGES, tmp_path, ["parquet"], state)
+
+    assert len(list((tmp_path / "daily_steps").iterdir())) == 2
+    assert parquet_ids(tmp_path) == ["a", "b", "c", "d"]
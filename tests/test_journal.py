@@ -0,0 +1,156 @@
+import pytest
+
+from conftest import StubClient
+from journal import load_journal, unfinished
+from sync_plan import PlanApplyError, apply_plan, new_plan, plan_archive, plan_create, replay_journal, run_plan
+
+DATABASE_ID = "db"
+
+
+def create_plan(*names):
+    plan = new_plan("activities", DATABASE_ID)
+    for name in names:
+        page = {"parent": {"database_id": DATABASE_ID}, "properties": {"Name": {"title": [{"text": {"content": name}}]}}}
+        plan_create(plan, page, name)
+    return plan
+
+
+def record_plan(name):
+    # A new PR that replaces the old one, as personal-records.py plans it
+    plan = create_plan()
+    archive_id = plan_archive(plan, {"id": "old"}, {"page_id": "old", "properties": {"PR": {"checkbox": False}}}, name)
+    page = {"parent": {"database_id": DATABASE_ID}, "properties": {"Name": {"title": [{"text": {"content": name}}]}}}
+    plan_create(plan, page, name, depends_on=[archive_id])
+    return plan
+
+
+def journal_lines(path):
+    return path.read_text().splitlines() if path.exists() else []
+
+
+def interrupted_create(journal, name="a"):
+    with pytest.raises(PlanApplyError):
+        apply_plan(StubClient(fail_creates=1), create_plan(name), str(journal))
+
+
+def test_clean_run_leaves_no_journal_entries(tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    client = StubClient()
+
+    apply_plan(client, create_plan("a", "b"), str(journal))
+
+    assert len(client.pages.created) == 2
+    assert journal_lines(journal) == []
+
+
+def test_failed_create_stays_unfinished(tmp_path):
+    journal = tmp_path / "journal.jsonl"
+
+    interrupted_create(journal)
+
+    assert len(unfinished(load_journal(str(journal)), DATABASE_ID)) == 1
+
+
+def test_replay_confirms_create_found_in_notion_without_resending(tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    interrupted_create(journal)
+
+    client = StubClient()
+    replay_journal(client, DATABASE_ID, str(journal), find_existing=lambda page: {"id": "existing"})
+
+    assert client.pages.created == []
+    assert journal_lines(journal) == []
+
+
+def test_replay_sends_create_missing_from_notion_before_the_plan_is_built(tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    interrupted_create(journal)
+    client = StubClient()
+    built = []
+
+    def build():
+        # The plan is built only after the interrupted create reached Notion
+        built.append(len(client.pages.created))
+        return create_plan()
+
+    run_plan(client, DATABASE_ID, build, journal_path=str(journal), find_existing=lambda page: None)
+
+    assert built == [1]
+    assert len(client.pages.created) == 1
+    assert journal_lines(journal) == []
+
+
+def test_failed_replay_stops_before_the_plan_is_built(tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    interrupted_create(journal)
+    built = []
+
+    with pytest.raises(PlanApplyError):
+        run_plan(StubClient(fail_creates=1), DATABASE_ID, lambda: built.append(True), journal_path=str(journal))
+
+    assert built == []
+    assert len(unfinished(load_journal(str(journal)), DATABASE_ID)) == 1
+
+
+def test_write_confirmed_earlier_is_sent_again_when_fresh_plan_needs_it(tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    apply_plan(StubClient(), create_plan("a"), str(journal))
+
+    # e.g. the page was archived by compact.py since the last run
+    client = StubClient()
+    apply_plan(client, create_plan("a"), str(journal))
+
+    assert len(client.pages.created) == 1
+
+
+def test_identical_writes_in_one_plan_are_sent_once(tmp_path):
+    client = StubClient()
+
+    apply_plan(client, create_plan("a", "a"), str(tmp_path / "journal.jsonl"))
+
+    assert len(client.pages.created) == 1
+
+
+def test_create_is_held_back_when_its_archive_fails(tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    plan = record_plan("5K")
+    client = StubClient(fail_updates=1)
+
+    apply_plan(client, plan, str(journal), strict=False)
+
+    assert client.pages.created == []
+    assert plan["failures"] == 2
+    assert len(unfinished(load_journal(str(journal)), DATABASE_ID)) == 2
+
+
+def test_replay_sends_held_back_create_after_its_archive(tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    apply_plan(StubClient(fail_updates=1), record_plan("5K"), str(journal), strict=False)
+
+    retry = StubClient()
+    replay_journal(retry, DATABASE_ID, str(journal), find_existing=lambda page: None)
+
+    assert [update["page_id"] for update in retry.pages.updated] == ["old"]
+    assert len(retry.pages.created) == 1
+    assert journal_lines(journal) == []
+
+
+def test_create_is_sent_when_its_archive_succeeds(tmp_path):
+    client = StubClient()
+
+    apply_plan(client, record_plan("5K"), str(tmp_path / "journal.jsonl"))
+
+    assert [update["page_id"] for update in client.pages.updated] == ["old"]
+    assert len(client.pages.created) == 1
+
+
+def test_truncate_keeps_other_databases(tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    other = new_plan("sleep", "other-db")
+    plan_create(other, {"parent": {"database_id": "other-db"}, "properties": {}}, "night")
+    with pytest.raises(PlanApplyError):
+        apply_plan(StubClient(fail_creates=1), other, str(journal))
+
+    apply_plan(StubClient(), create_plan("a"), str(journal))
+
+    assert len(unfinished(load_journal(str(journal)), "other-db")) == 1
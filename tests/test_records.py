@@ -0,0 +1,64 @@
+from journal import operation_id
+from pipelines import load_pipeline
+
+records = load_pipeline("personal_records")
+
+GARMIN_DATE = "2024-05-01T08:00:00.0"
+RECORD = {"typeId": 3, "prStartTimeGmtFormatted": GARMIN_DATE, "activityType": "running", "value": 1500.0}
+
+
+class StubGarmin:
+    def get_personal_record(self):
+        return [RECORD]
+
+
+class RecordsClient:
+    def __init__(self, existing, same_date=True):
+        self.existing = existing
+        self.same_date = same_date
+        self.databases = self
+
+    def retrieve(self, database_id):
+        return {"properties": {name: {"type": prop_type} for name, prop_type in records.REQUIRED_PROPERTIES.items()}}
+
+    def query(self, database_id, filter):
+        by_date = any("date" in part for part in filter["and"])
+        found = self.existing and (self.same_date or not by_date)
+        return {"results": [self.existing] if found else []}
+
+
+def stored_record(value, date):
+    # The page as Notion returns it: the same payload, with the date in offset form
+    name = records.replace_activity_name_by_typeId(RECORD["typeId"])
+    formatted, pace = records.format_garmin_value(value, "Running", RECORD["typeId"])
+    properties = records.record_update("existing", GARMIN_DATE, formatted, pace, name)["properties"]
+    properties["Date"] = {"type": "date", "date": {"start": date}}
+    return {"id": "existing", "properties": properties}
+
+
+def test_unchanged_record_plans_no_update(tmp_path):
+    client = RecordsClient(stored_record(RECORD["value"], "2024-05-01T08:00:00.000+00:00"))
+
+    plan = records.build_plan(StubGarmin(), client, "db", schema_cache=str(tmp_path / "schema.json"))
+
+    assert plan["updates"] == [] and plan["creates"] == []
+
+
+def test_changed_record_plans_update_with_only_changed_fields(tmp_path):
+    client = RecordsClient(stored_record(1600.0, "2024-05-01T08:00:00.000+00:00"))
+
+    plan = records.build_plan(StubGarmin(), client, "db", schema_cache=str(tmp_path / "schema.json"))
+
+    assert len(plan["updates"]) == 1
+    assert "Date" not in plan["updates"][0]["changes"]
+    assert "Value" in plan["updates"][0]["changes"]
+
+
+def test_new_pr_is_created_only_after_the_old_one_is_archived(tmp_path):
+    client = RecordsClient(stored_record(1600.0, "2024-01-01T08:00:00.000+00:00"), same_date=False)
+
+    plan = records.build_plan(StubGarmin(), client, "db", schema_cache=str(tmp_path / "schema.json"))
+
+    (archive,), (create,) = plan["archives"], plan["creates"]
+    assert archive["page_id"] == "existing"
+    assert create["depends_on"] == [operation_id("db", "archive", archive)]
@@ -0,0 +1,45 @@
+import pytest
+from garminconnect import GarminConnectAuthenticationError, GarminConnectConnectionError
+
+import scheduler
+
+
+class FakeGarmin:
+    logins = []
+    token_error = None
+
+    def __init__(self, email=None, password=None):
+        self.garth = self
+
+    def login(self, tokenstore=None):
+        FakeGarmin.logins.append("tokens" if tokenstore else "password")
+        if tokenstore and self.token_error:
+            raise self.token_error
+
+    def dump(self, path):
+        pass
+
+
+@pytest.fixture
+def fake_garmin(monkeypatch):
+    FakeGarmin.logins = []
+    monkeypatch.setattr(scheduler, "Garmin", FakeGarmin)
+    return FakeGarmin
+
+
+@pytest.mark.parametrize("error", [FileNotFoundError("no tokens"), GarminConnectAuthenticationError("expired")])
+def test_missing_or_rejected_tokens_fall_back_to_password(fake_garmin, tmp_path, error):
+    fake_garmin.token_error = error
+
+    scheduler.garmin_login("me@example.com", "secret", str(tmp_path))
+
+    assert fake_garmin.logins == ["tokens", "password"]
+
+
+def test_connection_error_is_raised_without_password_login(fake_garmin, tmp_path):
+    fake_garmin.token_error = GarminConnectConnectionError("network down")
+
+    with pytest.raises(GarminConnectConnectionError):
+        scheduler.garmin_login("me@example.com", "secret", str(tmp_path))
+
+    assert fake_garmin.logins == ["tokens"]
@@ -0,0 +1,39 @@
+import io
+import json
+import threading
+
+import pytest
+
+import tenants
+
+
+def write_config(tmp_path, *names):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps({"tenants": [{"name": name, "databases": {}} for name in names]}))
+    return str(path)
+
+
+@pytest.mark.parametrize("name", ["", "..", "../alice", "team/alice"])
+def test_names_that_are_not_plain_file_names_are_rejected(tmp_path, name):
+    with pytest.raises(ValueError, match="Invalid tenant name"):
+        tenants.load_tenants(write_config(tmp_path, name))
+
+
+def test_duplicate_names_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Duplicate tenant name"):
+        tenants.load_tenants(write_config(tmp_path, "alice", "alice"))
+
+
+def test_output_from_tenant_threads_is_prefixed_with_the_tenant(monkeypatch):
+    stream = io.StringIO()
+    output = tenants.TenantOutput(stream)
+    monkeypatch.setattr(tenants, "_sync_tenant", lambda tenant, *args: print("Syncing activities", file=output))
+
+    threads = [threading.Thread(target=tenants.sync_tenant, args=({"name": name}, None, "", "")) for name in ("alice", "bob")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print("Tenant alice done", file=output)
+
+    assert sorted(stream.getvalue().splitlines()) == ["Tenant alice done", "[alice] Syncing activities", "[bob] Syncing activities"]